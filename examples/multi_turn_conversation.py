@@ -65,7 +65,7 @@ async def multi_turn_demo():
         
         # Capture session ID for resumption
         session_id = client.get_current_session_id()
-        session_data = await client.load_session(session_id)
+        session_data = client.session_data
         
         print(f"\n📋 Session after 2 turns:")
         print(f"   ID: {session_id}")
@@ -84,7 +84,7 @@ async def multi_turn_demo():
     try:
         # Resume the session - this loads local data AND configures CLI --resume
         await client.start_or_resume_session(session_id)
-        print(f"✅ Session resumed. Local data: {len(client._session_data.conversation_history) if client._session_data else 0} messages")
+        print(f"✅ Session resumed. Local data: {len(client.session_data.conversation_history) if client.session_data else 0} messages")
         
         # Connect and continue the conversation
         await client.connect()
@@ -111,7 +111,7 @@ async def multi_turn_demo():
         
         # Show final session info
         final_session_id = client.get_current_session_id()
-        session_data = await client.load_session(final_session_id)
+        session_data = client.session_data
         
         print(f"\n📋 Final Session Summary:")
         print(f"   Original ID: {session_id}")
@@ -38,7 +38,7 @@ async def simple_demo():
         
         # Show session info
         session_id = client.get_current_session_id()
-        session_data = await client.load_session(session_id)
+        session_data = client.session_data
         
         print(f"\n📋 Session Info:")
         print(f"   ID: {session_id}")
@@ -1,15 +1,363 @@
 """Session storage and persistence utilities."""
 
-import json
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from types import ModuleType
+from typing import IO, Any
 
-from claude_code_sdk.types import ClaudeCodeOptions, Message
+import orjson
+import trio
+from claude_code_sdk.types import (
+    AssistantMessage,
+    ClaudeCodeOptions,
+    ContentBlock,
+    Message,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
 
+zstandard: ModuleType | None
+try:
+    import zstandard
+except ImportError:  # Optional dependency, only needed for compressed snapshots
+    zstandard = None
 
-@dataclass
+# On-disk layout: a small metadata header plus an append-only message log per session.
+# Single-document snapshots (the original format, also produced by ``compact``) are
+# still readable.
+_META_SUFFIX = ".meta.json"
+_LOG_SUFFIX = ".jsonl"
+_SNAPSHOT_SUFFIX = ".json"
+_COMPRESSED_SNAPSHOT_SUFFIX = ".json.zst"
+_TMP_SUFFIX = ".tmp"
+
+# Age after which a temporary file is assumed to belong to an interrupted write
+_TMP_MAX_AGE_SECONDS = 60 * 60
+
+_ZSTD_LEVEL = 3
+
+# Non-string dict keys are coerced to strings, as the stdlib json encoder does.
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# Log lines get their newline from orjson itself instead of a second bytes concatenation
+_LOG_LINE_OPTIONS = _ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+
+# Number of parsed sessions, and of saved session headers, kept in memory by each
+# SimpleSessionPersistence
+_CACHE_SIZE = 128
+
+# Absolute storage directories already created by this process, so repeated
+# construction of SimpleSessionPersistence for the same path skips the mkdir syscalls.
+# A directory removed later is recreated by the first write that finds it missing.
+_ensured_dirs: set[Path] = set()
+
+
+def _open_for_write(path: Path, mode: str) -> IO[Any]:
+    """Open ``path`` for writing, recreating its directory if it was removed after first use."""
+    try:
+        return path.open(mode)
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.open(mode)
+
+
+def _write_atomic(path: Path, payload: bytes, durable: bool = False) -> None:
+    """
+    Replace ``path`` with ``payload`` so readers never observe a partially written file.
+
+    The temporary file gets a unique name, so concurrent writers of the same file, in
+    this or another process, never write into each other's temporary file.
+
+    With ``durable``, the data is fsynced before the rename, so a crash cannot leave
+    the new name pointing at an empty file. The rename itself becomes durable with the
+    next fsync of the containing directory.
+    """
+    prefix = f".{path.name}."
+    try:
+        fd, tmp_name = tempfile.mkstemp(suffix=_TMP_SUFFIX, prefix=prefix, dir=path.parent)
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(suffix=_TMP_SUFFIX, prefix=prefix, dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_name)
+        raise
+
+
+def _sweep_temp_files(storage_path: Path) -> None:
+    """
+    Remove temporary files left behind by writes interrupted before their rename.
+
+    The storage directory may be shared with other processes, so only temporary files
+    old enough that no write can still be using them are removed.
+    """
+    cutoff = time.time() - _TMP_MAX_AGE_SECONDS
+    with os.scandir(storage_path) as entries:
+        for entry in entries:
+            if not (entry.name.startswith(".") and entry.name.endswith(_TMP_SUFFIX)):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def _require_zstandard() -> Any:
+    """Return the zstandard module, raising a helpful error if it is not installed."""
+    if zstandard is None:
+        raise ImportError(
+            "Compressed session snapshots require the 'zstandard' package; "
+            "install claude-code-session-client[zstd]"
+        )
+    return zstandard
+
+
+# Per-thread zstd compressor and decompressor; they are reused across calls but are not
+# safe to share between the worker threads that run concurrent saves and loads
+_zstd_local = threading.local()
+
+
+def _zstd_compressor() -> Any:
+    """Return this thread's zstd compressor, creating it on first use."""
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _require_zstandard().ZstdCompressor(level=_ZSTD_LEVEL)
+        _zstd_local.compressor = compressor
+    return compressor
+
+
+def _zstd_decompressor() -> Any:
+    """Return this thread's zstd decompressor, creating it on first use."""
+    decompressor = getattr(_zstd_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _require_zstandard().ZstdDecompressor()
+        _zstd_local.decompressor = decompressor
+    return decompressor
+
+
+def _datetime_to_stored(value: datetime) -> float | str:
+    """
+    Convert a datetime for storage.
+
+    Naive (local) datetimes become epoch seconds, which load without any string
+    parsing. Timezone-aware datetimes stay ISO 8601 strings so their offset survives.
+    """
+    if value.tzinfo is None:
+        return value.timestamp()
+    return value.isoformat()
+
+
+def _datetime_from_stored(value: float | str) -> datetime:
+    """Inverse of ``_datetime_to_stored``; also accepts ISO strings from older files."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return datetime.fromtimestamp(value)
+
+
+def _fsync_path(path: Path) -> None:
+    """Flush a file or directory to stable storage."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _text_block_to_dict(block: TextBlock) -> dict[str, Any]:
+    return {"type": "TextBlock", "text": block.text}
+
+
+def _tool_use_block_to_dict(block: ToolUseBlock) -> dict[str, Any]:
+    return {"type": "ToolUseBlock", "id": block.id, "name": block.name, "input": block.input}
+
+
+def _tool_result_block_to_dict(block: ToolResultBlock) -> dict[str, Any]:
+    block_dict: dict[str, Any] = {"type": "ToolResultBlock", "tool_use_id": block.tool_use_id}
+    # Optional fields are omitted when unset; the deserializer defaults them back to None
+    if block.content is not None:
+        block_dict["content"] = block.content
+    if block.is_error is not None:
+        block_dict["is_error"] = block.is_error
+    return block_dict
+
+
+_BLOCK_SERIALIZERS: dict[type, Callable[[Any], dict[str, Any]]] = {
+    TextBlock: _text_block_to_dict,
+    ToolUseBlock: _tool_use_block_to_dict,
+    ToolResultBlock: _tool_result_block_to_dict,
+}
+
+
+def _blocks_to_dicts(blocks: list[ContentBlock]) -> list[dict[str, Any]]:
+    content = []
+    for block in blocks:
+        serializer = _BLOCK_SERIALIZERS.get(type(block))
+        if serializer is not None:  # Skip unknown block types
+            content.append(serializer(block))
+    return content
+
+
+def _user_message_to_dict(msg: UserMessage) -> dict[str, Any]:
+    # Tool results arrive as user messages whose content is a list of blocks
+    content = msg.content if isinstance(msg.content, str) else _blocks_to_dicts(msg.content)
+    return {"message_type": "UserMessage", "content": content}
+
+
+def _assistant_message_to_dict(msg: AssistantMessage) -> dict[str, Any]:
+    return {"message_type": "AssistantMessage", "content": _blocks_to_dicts(msg.content)}
+
+
+def _system_message_to_dict(msg: SystemMessage) -> dict[str, Any]:
+    return {"message_type": "SystemMessage", "subtype": msg.subtype, "data": msg.data}
+
+
+def _result_message_to_dict(msg: ResultMessage) -> dict[str, Any]:
+    return {
+        "message_type": "ResultMessage",
+        "subtype": msg.subtype,
+        "duration_ms": msg.duration_ms,
+        "duration_api_ms": msg.duration_api_ms,
+        "is_error": msg.is_error,
+        "num_turns": msg.num_turns,
+        "session_id": msg.session_id,
+        "total_cost_usd": msg.total_cost_usd,
+        "usage": msg.usage,
+        "result": msg.result,
+    }
+
+
+# Serializers keyed on the exact message class, built once at import
+_MESSAGE_SERIALIZERS: dict[type, Callable[[Any], dict[str, Any]]] = {
+    UserMessage: _user_message_to_dict,
+    AssistantMessage: _assistant_message_to_dict,
+    SystemMessage: _system_message_to_dict,
+    ResultMessage: _result_message_to_dict,
+}
+
+
+def _message_to_dict(msg: Message) -> dict[str, Any] | None:
+    """Convert a message to a dictionary for JSON serialization, or None if unsupported."""
+    serializer = _MESSAGE_SERIALIZERS.get(type(msg))
+    return serializer(msg) if serializer is not None else None
+
+
+def _messages_to_dicts(messages: Iterable[Message]) -> Iterator[dict[str, Any]]:
+    """Serialize messages, skipping unsupported message types."""
+    for msg in messages:
+        msg_dict = _message_to_dict(msg)
+        if msg_dict is not None:
+            yield msg_dict
+
+
+def _encode_log_lines(messages: Iterable[Message]) -> bytes:
+    """Encode messages as newline-terminated JSON lines for the session log."""
+    return b"".join(
+        orjson.dumps(msg_dict, option=_LOG_LINE_OPTIONS)
+        for msg_dict in _messages_to_dicts(messages)
+    )
+
+
+def _text_block_from_dict(block_data: dict[str, Any]) -> TextBlock:
+    return TextBlock(text=block_data.get("text", ""))
+
+
+def _tool_use_block_from_dict(block_data: dict[str, Any]) -> ToolUseBlock:
+    return ToolUseBlock(
+        id=block_data.get("id", ""),
+        name=block_data.get("name", ""),
+        input=block_data.get("input", {}),
+    )
+
+
+def _tool_result_block_from_dict(block_data: dict[str, Any]) -> ToolResultBlock:
+    return ToolResultBlock(
+        tool_use_id=block_data.get("tool_use_id", ""),
+        content=block_data.get("content"),
+        is_error=block_data.get("is_error"),
+    )
+
+
+_BLOCK_DESERIALIZERS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "TextBlock": _text_block_from_dict,
+    "ToolUseBlock": _tool_use_block_from_dict,
+    "ToolResultBlock": _tool_result_block_from_dict,
+}
+
+
+def _blocks_from_dicts(content: list[dict[str, Any]]) -> list[ContentBlock]:
+    content_blocks: list[ContentBlock] = []
+    for block_data in content:
+        deserializer = _BLOCK_DESERIALIZERS.get(block_data.get("type", ""))
+        if deserializer is not None:  # Skip unknown block types
+            content_blocks.append(deserializer(block_data))
+    return content_blocks
+
+
+def _user_message_from_dict(msg_data: dict[str, Any]) -> UserMessage:
+    content = msg_data["content"]
+    if isinstance(content, str):
+        return UserMessage(content=content)
+    return UserMessage(content=_blocks_from_dicts(content))
+
+
+def _assistant_message_from_dict(msg_data: dict[str, Any]) -> AssistantMessage:
+    return AssistantMessage(content=_blocks_from_dicts(msg_data.get("content", [])))
+
+
+def _system_message_from_dict(msg_data: dict[str, Any]) -> SystemMessage:
+    return SystemMessage(subtype=msg_data.get("subtype", ""), data=msg_data.get("data", {}))
+
+
+def _result_message_from_dict(msg_data: dict[str, Any]) -> ResultMessage:
+    return ResultMessage(
+        subtype=msg_data.get("subtype", ""),
+        duration_ms=msg_data.get("duration_ms", 0),
+        duration_api_ms=msg_data.get("duration_api_ms", 0),
+        is_error=msg_data.get("is_error", False),
+        num_turns=msg_data.get("num_turns", 0),
+        session_id=msg_data.get("session_id", ""),
+        total_cost_usd=msg_data.get("total_cost_usd"),
+        usage=msg_data.get("usage"),
+        result=msg_data.get("result"),
+    )
+
+
+# Deserializers keyed on the stored ``message_type`` tag
+_MESSAGE_DESERIALIZERS: dict[str, Callable[[dict[str, Any]], Message]] = {
+    "UserMessage": _user_message_from_dict,
+    "AssistantMessage": _assistant_message_from_dict,
+    "SystemMessage": _system_message_from_dict,
+    "ResultMessage": _result_message_from_dict,
+}
+
+
+def _message_from_dict(msg_data: dict[str, Any]) -> Message | None:
+    """Create a message from a dictionary, returning None for unknown message types."""
+    deserializer = _MESSAGE_DESERIALIZERS.get(msg_data.get("message_type", ""))
+    return deserializer(msg_data) if deserializer is not None else None
+
+
+@dataclass(slots=True)
 class SessionData:
     """Session data for persistence."""
 
@@ -20,154 +368,72 @@ class SessionData:
     working_directory: str = ""
     options: ClaudeCodeOptions | None = None
 
-    def add_message(self, message: Message) -> None:
-        """Add a message to the conversation history."""
+    # Number of leading conversation_history messages already written to the session log
+    _last_saved_index: int = field(default=0, init=False, repr=False, compare=False)
+
+    # Set when conversation_history holds only part of the stored log (a filtered or
+    # metadata-only load); saves then only ever append to the log, never rewrite it
+    _partial_history: bool = field(default=False, init=False, repr=False, compare=False)
+
+    # Serialized form of ``options``, rebuilt only when a different options object is assigned
+    _options_source: ClaudeCodeOptions | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _options_dict: dict[str, Any] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def add_message(self, message: Message, now: datetime | None = None) -> None:
+        """
+        Add a message to the conversation history.
+
+        Args:
+            message: The message to append
+            now: Timestamp to record as last activity; defaults to the current time
+        """
         self.conversation_history.append(message)
-        self.last_activity = datetime.now()
+        self.last_activity = now if now is not None else datetime.now()
 
     def to_dict(self) -> dict[str, Any]:
         """Convert to dictionary for JSON serialization."""
-        from claude_code_sdk.types import (
-            AssistantMessage,
-            ResultMessage,
-            SystemMessage,
-            UserMessage,
-        )
-
-        # Convert messages to serializable format
-        serialized_messages: list[dict[str, Any]] = []
-        for msg in self.conversation_history:
-            msg_dict: dict[str, Any] = {
-                "message_type": type(msg).__name__,
-            }
-
-            if isinstance(msg, UserMessage):
-                msg_dict.update(
-                    {
-                        "content": msg.content,
-                    }
-                )
-            elif isinstance(msg, AssistantMessage):
-                msg_dict.update(
-                    {
-                        "content": [
-                            {
-                                "type": type(block).__name__,
-                                "text": getattr(block, "text", None),
-                                "id": getattr(block, "id", None),
-                                "name": getattr(block, "name", None),
-                                "input": getattr(block, "input", None),
-                                "tool_use_id": getattr(block, "tool_use_id", None),
-                                "is_error": getattr(block, "is_error", None),
-                            }
-                            for block in msg.content
-                        ],
-                    }
-                )
-            elif isinstance(msg, SystemMessage):
-                msg_dict.update(
-                    {
-                        "subtype": msg.subtype,
-                        "data": msg.data,
-                    }
-                )
-            elif isinstance(msg, ResultMessage):
-                msg_dict.update(
-                    {
-                        "subtype": msg.subtype,
-                        "duration_ms": msg.duration_ms,
-                        "duration_api_ms": msg.duration_api_ms,
-                        "is_error": msg.is_error,
-                        "num_turns": msg.num_turns,
-                        "session_id": msg.session_id,
-                        "total_cost_usd": msg.total_cost_usd,
-                        "usage": msg.usage,
-                        "result": msg.result,
-                    }
-                )
-
-            serialized_messages.append(msg_dict)
+        data = self._metadata_to_dict()
+        data["conversation_history"] = list(_messages_to_dicts(self.conversation_history))
+        return data
 
+    def _metadata_to_dict(self) -> dict[str, Any]:
+        """Convert everything except the conversation history to a dictionary."""
         return {
             "session_id": self.session_id,
-            "start_time": self.start_time.isoformat(),
-            "last_activity": self.last_activity.isoformat(),
-            "conversation_history": serialized_messages,
+            "start_time": _datetime_to_stored(self.start_time),
+            "last_activity": _datetime_to_stored(self.last_activity),
             "working_directory": self.working_directory,
-            "options": {
-                "model": self.options.model if self.options else None,
-                "allowed_tools": self.options.allowed_tools if self.options else [],
-                "permission_mode": self.options.permission_mode if self.options else None,
-            }
-            if self.options
-            else None,
+            "options": self._options_to_dict(),
         }
 
+    def _options_to_dict(self) -> dict[str, Any] | None:
+        """Return the serialized options, reusing the cached dict while options is unchanged."""
+        if self.options is not self._options_source:
+            self._options_source = self.options
+            self._options_dict = (
+                {
+                    "model": self.options.model,
+                    "allowed_tools": self.options.allowed_tools,
+                    "permission_mode": self.options.permission_mode,
+                }
+                if self.options
+                else None
+            )
+        return self._options_dict
+
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "SessionData":
         """Create from dictionary (JSON deserialization)."""
-        from claude_code_sdk.types import (
-            AssistantMessage,
-            ResultMessage,
-            SystemMessage,
-            TextBlock,
-            ToolResultBlock,
-            ToolUseBlock,
-            UserMessage,
-        )
-
         # Parse conversation history
         conversation_history: list[Message] = []
         for msg_data in data.get("conversation_history", []):
-            message_type = msg_data.get("message_type", "")
-
-            message: Message
-            if message_type == "UserMessage":
-                message = UserMessage(content=msg_data["content"])
-            elif message_type == "AssistantMessage":
-                # Reconstruct content blocks
-                content_blocks: list[TextBlock | ToolUseBlock | ToolResultBlock] = []
-                for block_data in msg_data.get("content", []):
-                    block_type = block_data.get("type", "")
-                    if block_type == "TextBlock":
-                        content_blocks.append(TextBlock(text=block_data.get("text", "")))
-                    elif block_type == "ToolUseBlock":
-                        content_blocks.append(
-                            ToolUseBlock(
-                                id=block_data.get("id", ""),
-                                name=block_data.get("name", ""),
-                                input=block_data.get("input", {}),
-                            )
-                        )
-                    elif block_type == "ToolResultBlock":
-                        content_blocks.append(
-                            ToolResultBlock(
-                                tool_use_id=block_data.get("tool_use_id", ""),
-                                content=block_data.get("content"),
-                                is_error=block_data.get("is_error"),
-                            )
-                        )
-                message = AssistantMessage(content=content_blocks)
-            elif message_type == "SystemMessage":
-                message = SystemMessage(
-                    subtype=msg_data.get("subtype", ""), data=msg_data.get("data", {})
-                )
-            elif message_type == "ResultMessage":
-                message = ResultMessage(
-                    subtype=msg_data.get("subtype", ""),
-                    duration_ms=msg_data.get("duration_ms", 0),
-                    duration_api_ms=msg_data.get("duration_api_ms", 0),
-                    is_error=msg_data.get("is_error", False),
-                    num_turns=msg_data.get("num_turns", 0),
-                    session_id=msg_data.get("session_id", ""),
-                    total_cost_usd=msg_data.get("total_cost_usd"),
-                    usage=msg_data.get("usage"),
-                    result=msg_data.get("result"),
-                )
-            else:
-                continue  # Skip unknown message types
-
-            conversation_history.append(message)
+            message = _message_from_dict(msg_data)
+            if message is not None:
+                conversation_history.append(message)
 
         # Parse options
         options = None
@@ -180,53 +446,625 @@ class SessionData:
 
         return cls(
             session_id=data["session_id"],
-            start_time=datetime.fromisoformat(data["start_time"]),
-            last_activity=datetime.fromisoformat(data["last_activity"]),
+            start_time=_datetime_from_stored(data["start_time"]),
+            last_activity=_datetime_from_stored(data["last_activity"]),
             conversation_history=conversation_history,
             working_directory=data.get("working_directory", ""),
             options=options,
         )
 
 
+@dataclass(frozen=True, slots=True)
+class _PendingSave:
+    """The state of a SessionData taken for one save, before it moves to a worker thread."""
+
+    session_data: SessionData
+    session_id: str
+    metadata: bytes
+    # _last_saved_index and the history length at capture time. Only the messages from
+    # ``start`` on are copied, unless the history was truncated below ``start``.
+    start: int
+    end: int
+    history: list[Message]
+
+    def messages_from(self, index: int) -> list[Message]:
+        """Return the captured messages from ``index`` to the end of the history."""
+        offset = self.start if self.start <= self.end else 0
+        if index >= offset:
+            return self.history[index - offset :]
+        # Only the unsaved tail was copied; a save that has to rewrite the whole log
+        # reads the saved messages from the SessionData, whose history only grows
+        return self.session_data.conversation_history[index : self.end]
+
+
 class SimpleSessionPersistence:
-    """Simple file-based session persistence."""
+    """
+    Simple file-based session persistence.
+
+    Each session is stored as a small ``{session_id}.meta.json`` header and an
+    append-only ``{session_id}.jsonl`` log holding one message per line, so recording
+    a message costs a single append instead of a rewrite of the whole history.
+
+    Files are encoded with orjson. Pass ``pretty=True`` to write indented metadata and
+    snapshot documents when they are meant to be read by humans.
+
+    Whole-file writes go through a temporary file and ``os.replace``, so a crash leaves
+    either the old or the new version in place; temporary files left by an interrupted
+    write more than an hour ago are removed when the storage directory is first
+    opened. Nothing is fsynced by default. With ``durable=True``, each temporary file
+    is fsynced before its rename, and ``sync`` flushes the session log and the storage
+    directory.
+
+    With ``compress=True``, ``compact`` writes zstd-compressed ``{session_id}.json.zst``
+    snapshots (requires the optional ``zstandard`` package).
+
+    Recently loaded or saved sessions are kept in a small LRU cache and returned as the
+    same SessionData instance for as long as their files are unchanged on disk. Saved
+    sessions are cached as a copy of what was written, never as the caller's object.
+
+    The async methods run their blocking file I/O in trio worker threads, so the event
+    loop keeps running while sessions are encoded, written and read.
+    """
 
-    def __init__(self, storage_path: Path | str | None = None):
+    def __init__(
+        self,
+        storage_path: Path | str | None = None,
+        pretty: bool = False,
+        durable: bool = False,
+        compress: bool = False,
+    ):
         if storage_path is None:
             storage_path = Path.home() / ".claude_session_client" / "sessions"
         self._storage_path = Path(storage_path)
-        self._storage_path.mkdir(parents=True, exist_ok=True)
+        absolute_path = self._storage_path.absolute()
+        if absolute_path not in _ensured_dirs:
+            self._storage_path.mkdir(parents=True, exist_ok=True)
+            _sweep_temp_files(self._storage_path)
+            _ensured_dirs.add(absolute_path)
+        self._pretty = pretty
+        self._durable = durable
+        if compress:
+            _require_zstandard()
+        self._compress = compress
+        # Serializes writes and cache updates across worker threads
+        self._lock = threading.RLock()
+        # session_id -> (loaded SessionData, file stamp it was loaded from, detached), where
+        # detached marks a copy made by a save that no caller has been handed yet
+        self._cache: OrderedDict[str, tuple[SessionData, tuple[int, ...], bool]] = OrderedDict()
+        # session_id -> (metadata bytes last written by save_session, resulting file stamp)
+        # for the _CACHE_SIZE most recently saved sessions
+        self._written: OrderedDict[str, tuple[bytes, tuple[int, ...]]] = OrderedDict()
+
+    def _meta_path(self, session_id: str) -> Path:
+        return self._storage_path / f"{session_id}{_META_SUFFIX}"
+
+    def _log_path(self, session_id: str) -> Path:
+        return self._storage_path / f"{session_id}{_LOG_SUFFIX}"
+
+    def _snapshot_path(self, session_id: str) -> Path:
+        return self._storage_path / f"{session_id}{_SNAPSHOT_SUFFIX}"
+
+    def _compressed_snapshot_path(self, session_id: str) -> Path:
+        return self._storage_path / f"{session_id}{_COMPRESSED_SNAPSHOT_SUFFIX}"
+
+    def _session_paths(self, session_id: str) -> tuple[Path, ...]:
+        """All files that may belong to a session."""
+        return (
+            self._meta_path(session_id),
+            self._log_path(session_id),
+            self._snapshot_path(session_id),
+            self._compressed_snapshot_path(session_id),
+        )
+
+    def _locate(self, session_id: str) -> tuple[Path, tuple[int, ...]] | None:
+        """
+        Find the file a session loads from, together with a stamp of its on-disk state.
+
+        The path is the metadata header when the session has a message log, otherwise a
+        snapshot. The stamp combines file mtimes and sizes. Returns None if absent.
+        """
+        meta_path = self._meta_path(session_id)
+        try:
+            meta_stat = meta_path.stat()
+        except FileNotFoundError:
+            for snapshot_path in (
+                self._compressed_snapshot_path(session_id),
+                self._snapshot_path(session_id),
+            ):
+                try:
+                    snapshot_stat = snapshot_path.stat()
+                except FileNotFoundError:
+                    continue
+                return snapshot_path, (snapshot_stat.st_mtime_ns, snapshot_stat.st_size)
+            return None
+
+        try:
+            log_stat = self._log_path(session_id).stat()
+        except FileNotFoundError:
+            return meta_path, (meta_stat.st_mtime_ns, meta_stat.st_size, 0, 0)
+        return meta_path, (
+            meta_stat.st_mtime_ns,
+            meta_stat.st_size,
+            log_stat.st_mtime_ns,
+            log_stat.st_size,
+        )
+
+    def _encode_document(self, data: dict[str, Any]) -> bytes:
+        """Encode a metadata or snapshot document."""
+        if self._pretty:
+            return orjson.dumps(data, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2)
+        return orjson.dumps(data, option=_ORJSON_OPTIONS)
 
     async def save_session(self, session_data: SessionData) -> None:
-        """Save session data to file."""
-        file_path = self._storage_path / f"{session_data.session_id}.json"
-        with file_path.open("w", encoding="utf-8") as f:
-            json.dump(session_data.to_dict(), f, indent=2, ensure_ascii=False)
-
-    async def load_session(self, session_id: str) -> SessionData | None:
-        """Load session data from file."""
-        file_path = self._storage_path / f"{session_id}.json"
-        if not file_path.exists():
+        """
+        Save session metadata and any messages not yet in the session log.
+
+        Only messages appended since the last save of the same SessionData are written;
+        the history is treated as append-only, so editing or replacing a message that
+        was already saved is not detected. The log is rewritten from scratch when it is
+        missing or the history has been truncated below what was saved.
+
+        The session ID, metadata and unsaved messages are captured before the write is
+        handed to a worker thread, so changes made to the SessionData while the write
+        runs are left for the next save.
+        """
+        await trio.to_thread.run_sync(self._save_sync, self._capture(session_data))
+
+    def _capture(self, session_data: SessionData) -> _PendingSave:
+        """Take the state a save writes, on the event loop that owns the SessionData."""
+        history = session_data.conversation_history
+        start = session_data._last_saved_index
+        return _PendingSave(
+            session_data=session_data,
+            session_id=session_data.session_id,
+            metadata=self._encode_document(session_data._metadata_to_dict()),
+            start=start,
+            end=len(history),
+            history=history[start:] if start <= len(history) else history[:],
+        )
+
+    def _save_sync(self, pending: _PendingSave) -> None:
+        session_data = pending.session_data
+        session_id = pending.session_id
+        with self._lock:
+            end = pending.end
+            start = session_data._last_saved_index
+            if start != pending.start and start > end:
+                # A save of the same SessionData captured after this one already ran
+                return
+
+            # Nothing to write if there are no new messages, the metadata encodes the same
+            # as last time and the files have not been touched since
+            before = self._locate(session_id)
+            if start == end:
+                written = self._written.get(session_id)
+                if written is not None and written[0] == pending.metadata:
+                    if before is not None and before[1] == written[1]:
+                        return
+
+            log_path = self._log_path(session_id)
+            appended = False
+            if session_data._partial_history and not log_path.exists():
+                # A filtered or metadata-only history must never replace what is stored;
+                # move a snapshot's full history into a log first, then the header
+                folded = self._fold_snapshot(session_id, pending, start)
+                _write_atomic(self._meta_path(session_id), pending.metadata, self._durable)
+                if folded:
+                    self._snapshot_path(session_id).unlink(missing_ok=True)
+                    self._compressed_snapshot_path(session_id).unlink(missing_ok=True)
+            elif (session_data._partial_history or 0 < start <= end) and log_path.exists():
+                _write_atomic(self._meta_path(session_id), pending.metadata, self._durable)
+                self._append_sync(session_id, pending.messages_from(start))
+                appended = True
+            else:
+                # Write the log before the header that makes it authoritative, then drop
+                # any snapshot the session was loaded from, which the header now shadows
+                start = 0
+                _write_atomic(log_path, _encode_log_lines(pending.messages_from(0)), self._durable)
+                _write_atomic(self._meta_path(session_id), pending.metadata, self._durable)
+                self._snapshot_path(session_id).unlink(missing_ok=True)
+                self._compressed_snapshot_path(session_id).unlink(missing_ok=True)
+            session_data._last_saved_index = end
+
+            located = self._locate(session_id)
+            if located is None:
+                return
+            self._written[session_id] = (pending.metadata, located[1])
+            self._written.move_to_end(session_id)
+            if len(self._written) > _CACHE_SIZE:
+                self._written.popitem(last=False)
+            if session_data._partial_history:
+                self._cache.pop(session_id, None)
+            else:
+                self._cache_saved(pending, start, appended, before, located[1])
+
+    def _cache_saved(
+        self,
+        pending: _PendingSave,
+        start: int,
+        appended: bool,
+        before: tuple[Path, tuple[int, ...]] | None,
+        stamp: tuple[int, ...],
+    ) -> None:
+        """
+        Cache the SessionData a load of the just-saved files would return.
+
+        The caller keeps changing its own SessionData after the save, so the cache gets
+        a separate object rebuilt from the written metadata, holding only the messages
+        that were actually written. An append extends the copy left by the previous
+        save when the files were unchanged since; otherwise the entry is dropped rather
+        than rebuilt from the whole history.
+        """
+        session_id = pending.session_id
+        if appended:
+            cached = self._cache.get(session_id)
+            if cached is None or not cached[2] or before is None or cached[1] != before[1]:
+                self._cache.pop(session_id, None)
+                return
+            history = cached[0].conversation_history
+        else:
+            history = []
+
+        session_data = SessionData.from_dict(orjson.loads(pending.metadata))
+        history.extend(
+            msg for msg in pending.messages_from(start) if type(msg) in _MESSAGE_SERIALIZERS
+        )
+        session_data.conversation_history = history
+        session_data._last_saved_index = len(history)
+        self._cache_put(session_id, session_data, stamp, detached=True)
+
+    def _fold_snapshot(self, session_id: str, pending: _PendingSave, start: int) -> bool:
+        """
+        Write the log of a partially loaded session that has no log yet.
+
+        The log holds the full history of the session's snapshot followed by the
+        messages added since it was loaded. Without a readable snapshot, the in-memory
+        history is all there is and is written as is.
+
+        Returns:
+            bool: True if a snapshot was folded into the log
+        """
+        stored = None
+        for snapshot_path in (
+            self._compressed_snapshot_path(session_id),
+            self._snapshot_path(session_id),
+        ):
+            if snapshot_path.exists():
+                stored = self._load_snapshot(snapshot_path)
+                break
+
+        if stored is None:
+            payload = _encode_log_lines(pending.messages_from(0))
+        else:
+            payload = _encode_log_lines(stored.conversation_history) + _encode_log_lines(
+                pending.messages_from(start)
+            )
+        _write_atomic(self._log_path(session_id), payload, self._durable)
+        return stored is not None
+
+    async def save_sessions(self, sessions: Iterable[SessionData]) -> None:
+        """
+        Save several sessions in a single worker-thread call.
+
+        With ``durable=True`` the written files are fsynced once at the end of the
+        batch, followed by a single fsync of the storage directory.
+        """
+        pending = [self._capture(session_data) for session_data in sessions]
+        await trio.to_thread.run_sync(self._save_many_sync, pending)
+
+    def _save_many_sync(self, pending: list[_PendingSave]) -> None:
+        for pending_save in pending:
+            self._save_sync(pending_save)
+        if self._durable:
+            for pending_save in pending:
+                self._fsync_files(pending_save.session_id)
+            self._fsync_directory()
+
+    async def append_message(self, session_id: str, message: Message) -> None:
+        """Append a single message to the session's message log."""
+        await self.append_messages(session_id, [message])
+
+    async def append_messages(self, session_id: str, messages: Iterable[Message]) -> None:
+        """Append a batch of messages to the session's message log in a single write."""
+        await trio.to_thread.run_sync(self._append_sync, session_id, list(messages))
+
+    def _append_sync(self, session_id: str, messages: Iterable[Message]) -> None:
+        payload = _encode_log_lines(messages)
+        if not payload:
+            return
+        with self._lock, _open_for_write(self._log_path(session_id), "ab") as f:
+            f.write(payload)
+
+    async def load_session(
+        self, session_id: str, message_types: tuple[type, ...] | None = None
+    ) -> SessionData | None:
+        """
+        Load session data from file.
+
+        Args:
+            session_id: The session ID to load
+            message_types: If given, only messages of these types are kept in the
+                          loaded conversation history. Saving the result appends new
+                          messages and keeps the stored ones that were filtered out.
+
+        Returns:
+            SessionData | None: Session data if found, None otherwise
+        """
+        return await trio.to_thread.run_sync(self._load_sync, session_id, message_types)
+
+    def _load_sync(
+        self, session_id: str, message_types: tuple[type, ...] | None = None
+    ) -> SessionData | None:
+        located = self._locate(session_id)
+        if located is None:
+            with self._lock:
+                self._cache.pop(session_id, None)
+            return None
+        file_path, stamp = located
+
+        if message_types is None:
+            with self._lock:
+                cached = self._cache.get(session_id)
+                if cached is not None and cached[1] == stamp:
+                    # The instance is shared from now on, so later saves must not extend it
+                    self._cache[session_id] = (cached[0], stamp, False)
+                    self._cache.move_to_end(session_id)
+                    return cached[0]
+
+        if file_path == self._meta_path(session_id):
+            session_data = self._load_log(session_id)
+        else:
+            session_data = self._load_snapshot(file_path)
+
+        if session_data is not None and message_types is not None:
+            session_data.conversation_history = [
+                msg for msg in session_data.conversation_history if isinstance(msg, message_types)
+            ]
+            session_data._last_saved_index = len(session_data.conversation_history)
+            session_data._partial_history = True
+        elif session_data is not None:
+            self._cache_put(session_id, session_data, stamp)
+        return session_data
+
+    def _cache_put(
+        self,
+        session_id: str,
+        session_data: SessionData,
+        stamp: tuple[int, ...],
+        detached: bool = False,
+    ) -> None:
+        """Insert or refresh a cache entry, evicting the least recently used one if full."""
+        with self._lock:
+            self._cache[session_id] = (session_data, stamp, detached)
+            self._cache.move_to_end(session_id)
+            if len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _load_log(self, session_id: str) -> SessionData | None:
+        """Load a session stored as a metadata header and message log."""
+        meta_path = self._meta_path(session_id)
+        try:
+            session_data = SessionData.from_dict(orjson.loads(meta_path.read_bytes()))
+
+            # Stream the log so only one raw line is held in memory at a time; a header
+            # without a log is a session with no messages yet
+            log_path = self._log_path(session_id)
+            with contextlib.suppress(FileNotFoundError), log_path.open("rb") as f:
+                for line in f:
+                    # A line without its newline is a torn write from an interrupted
+                    # append; everything before it is intact.
+                    if not line.endswith(b"\n"):
+                        break
+                    message = _message_from_dict(orjson.loads(line))
+                    if message is not None:
+                        session_data.conversation_history.append(message)
+            session_data._last_saved_index = len(session_data.conversation_history)
+            return session_data
+        except (FileNotFoundError, orjson.JSONDecodeError, KeyError, ValueError):
             return None
 
+    def _load_snapshot(self, file_path: Path, include_history: bool = True) -> SessionData | None:
+        """Load a session stored as a single, optionally compressed, JSON document."""
         try:
-            with file_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            return SessionData.from_dict(data)
-        except (json.JSONDecodeError, KeyError, ValueError):
+            payload = file_path.read_bytes()
+            if file_path.name.endswith(_COMPRESSED_SNAPSHOT_SUFFIX):
+                payload = _zstd_decompressor().decompress(payload)
+            data = orjson.loads(payload)
+            if not include_history:
+                data.pop("conversation_history", None)
+            session_data = SessionData.from_dict(data)
+            session_data._last_saved_index = len(session_data.conversation_history)
+            return session_data
+        except (FileNotFoundError, orjson.JSONDecodeError, KeyError, ValueError):
+            return None
+
+    async def load_session_metadata(self, session_id: str) -> SessionData | None:
+        """
+        Load a session's metadata without its conversation history.
+
+        Only the metadata header is read for sessions stored as a log, and the messages
+        of snapshot sessions are not decoded. The returned conversation_history is empty;
+        messages added to it are appended to the stored history when the session is saved.
+
+        Args:
+            session_id: The session ID to load
+
+        Returns:
+            SessionData | None: Session data without history if found, None otherwise
+        """
+        return await trio.to_thread.run_sync(self._load_metadata_sync, session_id)
+
+    def _load_metadata_sync(self, session_id: str) -> SessionData | None:
+        located = self._locate(session_id)
+        if located is None:
             return None
+        file_path = located[0]
+
+        session_data: SessionData | None
+        if file_path == self._meta_path(session_id):
+            try:
+                session_data = SessionData.from_dict(orjson.loads(file_path.read_bytes()))
+            except (FileNotFoundError, orjson.JSONDecodeError, KeyError, ValueError):
+                return None
+        else:
+            session_data = self._load_snapshot(file_path, include_history=False)
+
+        if session_data is not None:
+            session_data._partial_history = True
+        return session_data
+
+    async def compact(self, session_id: str) -> bool:
+        """
+        Fold a session's metadata and message log into a single JSON document.
+
+        The document is zstd-compressed when the persistence was created with
+        ``compress=True``.
+
+        Returns:
+            bool: True if the session was compacted, False if not found
+        """
+        return await trio.to_thread.run_sync(self._compact_sync, session_id)
+
+    def _compact_sync(self, session_id: str) -> bool:
+        # Hold the lock from the read to the unlinks so an append made in between
+        # cannot land in a log that is about to be removed
+        with self._lock:
+            session_data = self._load_sync(session_id)
+            if session_data is None:
+                return False
+
+            payload = self._encode_document(session_data.to_dict())
+            self._cache.pop(session_id, None)
+            self._written.pop(session_id, None)
+            if self._compress:
+                _write_atomic(
+                    self._compressed_snapshot_path(session_id),
+                    _zstd_compressor().compress(payload),
+                    self._durable,
+                )
+                self._snapshot_path(session_id).unlink(missing_ok=True)
+            else:
+                _write_atomic(self._snapshot_path(session_id), payload, self._durable)
+                self._compressed_snapshot_path(session_id).unlink(missing_ok=True)
+            # The header goes first: a header without its log would read as an empty
+            # session that shadows the snapshot
+            self._meta_path(session_id).unlink(missing_ok=True)
+            self._log_path(session_id).unlink(missing_ok=True)
+        return True
+
+    async def rename_session(self, old_session_id: str, new_session_id: str) -> bool:
+        """
+        Move a session's files to a new session ID without rewriting their content.
+
+        The stored metadata still names the old session ID until the session is saved
+        again under the new one.
+
+        Returns:
+            bool: True if any files were moved, False if the old session was not found
+        """
+        return await trio.to_thread.run_sync(self._rename_sync, old_session_id, new_session_id)
+
+    def _rename_sync(self, old_session_id: str, new_session_id: str) -> bool:
+        with self._lock:
+            self._cache.pop(old_session_id, None)
+            self._written.pop(old_session_id, None)
+            self._cache.pop(new_session_id, None)
+            self._written.pop(new_session_id, None)
+            renamed = False
+            for old_path, new_path in zip(
+                self._session_paths(old_session_id), self._session_paths(new_session_id)
+            ):
+                if old_path.exists():
+                    os.replace(old_path, new_path)
+                    renamed = True
+            return renamed
+
+    async def sync(self, session_id: str) -> None:
+        """Flush a session's files and the storage directory to disk when ``durable`` is set."""
+        if self._durable:
+            await trio.to_thread.run_sync(self._fsync_session, session_id)
+
+    def _fsync_session(self, session_id: str) -> None:
+        self._fsync_files(session_id)
+        self._fsync_directory()
+
+    def _fsync_files(self, session_id: str) -> None:
+        # Whole-file writes are fsynced before their rename, so only appends are pending
+        log_path = self._log_path(session_id)
+        if log_path.exists():
+            _fsync_path(log_path)
+
+    def _fsync_directory(self) -> None:
+        if os.name == "posix":  # Directories cannot be opened for fsync on Windows
+            _fsync_path(self._storage_path)
 
     async def list_sessions(self) -> list[str]:
         """List all session IDs."""
-        session_ids = []
-        for file_path in self._storage_path.glob("*.json"):
-            session_ids.append(file_path.stem)  # filename without .json extension
+        return await trio.to_thread.run_sync(self._list_sync)
+
+    def _list_sync(self) -> list[str]:
+        session_ids = set()
+        with os.scandir(self._storage_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(_META_SUFFIX):
+                    suffix = _META_SUFFIX
+                elif name.endswith(_SNAPSHOT_SUFFIX):
+                    suffix = _SNAPSHOT_SUFFIX
+                elif name.endswith(_COMPRESSED_SNAPSHOT_SUFFIX):
+                    suffix = _COMPRESSED_SNAPSHOT_SUFFIX
+                else:
+                    continue
+                if entry.is_file(follow_symlinks=False):
+                    session_ids.add(name[: -len(suffix)])
         return sorted(session_ids)
 
+    async def list_sessions_with_headers(self) -> list[SessionData]:
+        """
+        List all sessions with their metadata, without loading any conversation history.
+
+        The headers are read concurrently in worker threads. Sessions whose files
+        cannot be decoded are left out.
+
+        Returns:
+            list[SessionData]: Session metadata ordered by session ID
+        """
+        session_ids = await self.list_sessions()
+        headers: list[SessionData | None] = [None] * len(session_ids)
+
+        async def load_header(index: int, session_id: str) -> None:
+            headers[index] = await self.load_session_metadata(session_id)
+
+        async with trio.open_nursery() as nursery:
+            for index, session_id in enumerate(session_ids):
+                nursery.start_soon(load_header, index, session_id)
+        return [header for header in headers if header is not None]
+
     async def delete_session(self, session_id: str) -> bool:
-        """Delete a session file."""
-        file_path = self._storage_path / f"{session_id}.json"
-        if file_path.exists():
-            file_path.unlink()
-            return True
-        return False
+        """Delete all files belonging to a session."""
+        return await trio.to_thread.run_sync(self._delete_sync, session_id)
+
+    def _delete_sync(self, session_id: str) -> bool:
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._written.pop(session_id, None)
+            deleted = False
+            for file_path in self._session_paths(session_id):
+                try:
+                    file_path.unlink()
+                except FileNotFoundError:
+                    continue
+                deleted = True
+            return deleted
+
+    async def delete_sessions(self, session_ids: Iterable[str]) -> int:
+        """
+        Delete several sessions in a single worker-thread call.
+
+        Returns:
+            int: The number of sessions that were found and deleted
+        """
+        return await trio.to_thread.run_sync(self._delete_many_sync, list(session_ids))
+
+    def _delete_many_sync(self, session_ids: list[str]) -> int:
+        return sum(self._delete_sync(session_id) for session_id in session_ids)
@@ -1,15 +1,33 @@
 """Session Persistent Client that wraps ClaudeSDKClient for automatic session persistence."""
 
+import logging
 from collections.abc import AsyncIterable, AsyncIterator
+from contextlib import AbstractAsyncContextManager
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+import trio
 from claude_code_sdk import ClaudeSDKClient
-from claude_code_sdk.types import ClaudeCodeOptions, Message, ResultMessage
+from claude_code_sdk.types import (
+    AssistantMessage,
+    ClaudeCodeOptions,
+    Message,
+    ResultMessage,
+    UserMessage,
+)
 
 from ._internal.session_storage import SessionData, SimpleSessionPersistence
 
+logger = logging.getLogger(__name__)
+
+# Delay between the first unsaved message and the write that flushes it, so messages
+# arriving in quick succession are appended to the session log in a single batch.
+_FLUSH_DELAY_SECONDS = 0.05
+
+# Message types recorded in the session history unless the caller chooses otherwise
+_DEFAULT_PERSIST_TYPES: tuple[type, ...] = (UserMessage, AssistantMessage, ResultMessage)
+
 
 class SessionPersistentClient:
     """
@@ -21,7 +39,10 @@ class SessionPersistentClient:
     Key features:
     - Wraps ClaudeSDKClient for all Claude interactions
     - Automatically extracts session IDs from received messages
-    - Saves conversation history to JSON files
+    - Saves conversation history to append-only JSON Lines logs
+    - Batches log writes in a background task while used as an async context manager,
+      so disk I/O stays off the receive path (with bare connect()/disconnect() calls,
+      each message is saved as it arrives)
     - Provides session management (list, delete, inspect)
     - Uses server-generated session IDs (no client-side UUID generation)
     - Handles server-side session ID changes gracefully while preserving conversation history
@@ -30,8 +51,7 @@ class SessionPersistentClient:
     The Claude server may change session IDs during a conversation. This client handles
     such changes correctly by:
     - Preserving all conversation history when session ID changes
-    - Moving the session data to the new session ID
-    - Cleaning up old session files automatically
+    - Moving the session data to the new session ID by renaming its files
     - Maintaining session continuity and start times
 
     Example:
@@ -54,6 +74,8 @@ class SessionPersistentClient:
         self,
         options: ClaudeCodeOptions | None = None,
         storage_path: Path | str | None = None,
+        durable: bool = False,
+        persist_types: tuple[type, ...] = _DEFAULT_PERSIST_TYPES,
     ):
         """
         Initialize the session persistent client.
@@ -63,11 +85,24 @@ class SessionPersistentClient:
             storage_path: Directory to store session files.
                          This path is passed to SimpleSessionPersistence which creates the directory
                          if it doesn't exist and stores session JSON files there.
+            durable: If True, fsync the session files and storage directory on disconnect
+            persist_types: Message types recorded in the session history. Other messages
+                          (by default SystemMessage) are passed through but not saved.
         """
         self._client = ClaudeSDKClient(options)
-        self._persistence = SimpleSessionPersistence(storage_path)
+        self._persistence = SimpleSessionPersistence(storage_path, durable=durable)
         self._current_session_id: str | None = None
         self._session_data: SessionData | None = None
+        self._persist_types = persist_types
+
+        # Serializes saves with the session ID change, so a save never writes files under
+        # an ID that is being renamed away
+        self._persistence_lock = trio.Lock()
+
+        # Background flushing of received messages, active inside ``async with``
+        self._dirty = trio.Event()
+        self._flusher_nursery_manager: AbstractAsyncContextManager[trio.Nursery] | None = None
+        self._flusher_nursery: trio.Nursery | None = None
 
     @property
     def client(self) -> ClaudeSDKClient:
@@ -124,9 +159,16 @@ class SessionPersistentClient:
             This method configures the underlying ClaudeSDKClient to use --resume <session_id>
             when connecting to Claude CLI, which allows resuming server-side conversation state.
         """
+        # Write out anything still pending for the session being left
+        if self._dirty.is_set():
+            self._dirty = trio.Event()
+            await self._flush()
+
         if session_id:
             # Load existing session data if available
-            self._session_data = await self._persistence.load_session(session_id)
+            self._session_data = await self._persistence.load_session(
+                session_id, self._persist_types
+            )
             if self._session_data:
                 self._current_session_id = session_id
 
@@ -143,21 +185,39 @@ class SessionPersistentClient:
 
     async def disconnect(self) -> None:
         """Disconnect from Claude and finalize session persistence."""
-        # Update final session metadata before disconnecting
-        if self._session_data:
-            self._session_data.last_activity = datetime.now()
-            await self._persistence.save_session(self._session_data)
-
-        await self._client.disconnect()
+        try:
+            # Update final session metadata before disconnecting; this also writes
+            # anything the background flusher has not saved yet
+            if self._session_data:
+                async with self._persistence_lock:
+                    self._session_data.last_activity = datetime.now()
+                    await self._persistence.save_session(self._session_data)
+                    await self._persistence.sync(self._session_data.session_id)
+        finally:
+            await self._client.disconnect()
 
     async def __aenter__(self) -> "SessionPersistentClient":
-        """Enter async context - automatically connects."""
+        """Enter async context - automatically connects and starts background flushing."""
         await self.connect()
+
+        # The flusher's nursery is opened here and closed in __aexit__, so it lives
+        # exactly as long as the caller's ``async with`` block
+        self._flusher_nursery_manager = trio.open_nursery()
+        self._flusher_nursery = await self._flusher_nursery_manager.__aenter__()
+        self._flusher_nursery.start_soon(self._flusher)
         return self
 
     async def __aexit__(self, _exc_type: Any, _exc_val: Any, _exc_tb: Any) -> bool:
         """Exit async context - automatically disconnects and saves session."""
-        await self.disconnect()
+        # Stop the background flusher; disconnect() saves anything it left pending
+        try:
+            if self._flusher_nursery_manager is not None and self._flusher_nursery is not None:
+                self._flusher_nursery.cancel_scope.cancel()
+                await self._flusher_nursery_manager.__aexit__(None, None, None)
+        finally:
+            self._flusher_nursery_manager = None
+            self._flusher_nursery = None
+            await self.disconnect()
         return False
 
     # Session Management Methods
@@ -166,6 +226,11 @@ class SessionPersistentClient:
         """Get the current session ID (server-generated)."""
         return self._current_session_id
 
+    @property
+    def session_data(self) -> SessionData | None:
+        """The in-memory data of the current session, without reading it back from disk."""
+        return self._session_data
+
     async def list_sessions(self) -> list[str]:
         """List all saved session IDs."""
         return await self._persistence.list_sessions()
@@ -186,6 +251,9 @@ class SessionPersistentClient:
         """
         Load session data for inspection.
 
+        For the current session, prefer the session_data property, which returns the
+        data already held in memory.
+
         Args:
             session_id: The session ID to load
 
@@ -203,12 +271,14 @@ class SessionPersistentClient:
         This method handles server-side session ID changes correctly:
         - When a session_id is first received, a new session is created
         - When a session_id changes during an active session, the existing
-          conversation history is preserved and moved to the new session_id
-        - Old session files are cleaned up when session_id changes
+          conversation history is preserved and its files are renamed to the new session_id
 
         Args:
             message: Message received from ClaudeSDKClient
         """
+        # One timestamp for everything recorded about this message
+        now = datetime.now()
+
         # Extract session ID from message metadata if available
         session_id = getattr(message, "session_id", None)
 
@@ -228,35 +298,81 @@ class SessionPersistentClient:
 
                 if self._session_data is not None:
                     # We have existing session data, so this is a session ID update
-                    # Update the session ID in the existing session data
-                    self._session_data.session_id = session_id
-                    self._session_data.last_activity = datetime.now()
-
-                    # Save the session under the new session ID
-                    await self._persistence.save_session(self._session_data)
-
-                    # Clean up the old session file if it exists
+                    async with self._persistence_lock:
+                        # Update the session ID in the existing session data
+                        self._session_data.session_id = session_id
+                        self._session_data.last_activity = now
+
+                        if old_session_id:
+                            # Move the stored files to the new session ID; the stored
+                            # content is unchanged, so the metadata is refreshed by the
+                            # next regular flush
+                            await self._persistence.rename_session(old_session_id, session_id)
+                        else:
+                            # Save the session under the new session ID
+                            await self._persistence.save_session(self._session_data)
                     if old_session_id:
-                        await self._persistence.delete_session(old_session_id)
+                        await self._schedule_flush()
 
                 else:
-                    # No existing session data - try to load session with new session_id first
-                    # (in case this is a resumed session), otherwise create new one
-                    self._session_data = await self._persistence.load_session(session_id)
+                    # No existing session data - load it from disk only when this is the
+                    # session being resumed (a fresh session has nothing stored yet),
+                    # otherwise create a new one
+                    if self._client.options and self._client.options.resume == session_id:
+                        self._session_data = await self._persistence.load_session(
+                            session_id, self._persist_types
+                        )
                     if not self._session_data:
                         self._session_data = SessionData(
                             session_id=session_id,
-                            start_time=datetime.now(),
-                            last_activity=datetime.now(),
+                            start_time=now,
+                            last_activity=now,
                             conversation_history=[],
                             working_directory=str(Path.cwd()),
                             options=self._client.options,
                         )
 
+                        # Write the metadata header for the new session
+                        async with self._persistence_lock:
+                            await self._persistence.save_session(self._session_data)
+
+        # Message types outside the persistence policy never reach the session history
+        if not isinstance(message, self._persist_types):
+            return
+
         # Add message directly to session (Message objects are already the right type)
         if self._session_data:
-            self._session_data.add_message(message)
-            self._session_data.last_activity = datetime.now()
+            self._session_data.add_message(message, now)
+
+            # Mark the session dirty; the flusher batches the actual write
+            await self._schedule_flush()
+
+    async def _schedule_flush(self) -> None:
+        """Hand the session to the background flusher, or save it now if none is running."""
+        if self._flusher_nursery is not None:
+            self._dirty.set()
+        else:
+            await self._flush()
 
-            # Save session after each message
-            await self._persistence.save_session(self._session_data)
+    async def _flusher(self) -> None:
+        """
+        Background task that saves the dirty session in batches.
+
+        A failed write is logged rather than raised, so it cannot cancel the caller's
+        code running in the same ``async with`` block. Messages it did not write stay
+        pending and are retried by the next flush or the final save on disconnect.
+        """
+        while True:
+            await self._dirty.wait()
+            await trio.sleep(_FLUSH_DELAY_SECONDS)
+            self._dirty = trio.Event()
+            try:
+                await self._flush()
+            except Exception:
+                logger.exception("Failed to save session %s", self._current_session_id)
+
+    async def _flush(self) -> None:
+        """Save the current session; only messages not yet in its log are written."""
+        if self._session_data is not None:
+            async with self._persistence_lock:
+                await self._persistence.save_session(self._session_data)
@@ -0,0 +1,256 @@
+"""Tests for SessionPersistentClient persistence behaviour."""
+
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+import trio
+from claude_code_sdk.types import (
+    AssistantMessage,
+    ClaudeCodeOptions,
+    Message,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    UserMessage,
+)
+
+from claude_code_session_client import session_client
+from claude_code_session_client._internal.session_storage import SimpleSessionPersistence
+from claude_code_session_client.session_client import SessionPersistentClient
+
+
+def result_message(session_id: str) -> ResultMessage:
+    """Create a ResultMessage carrying a server session ID."""
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1,
+        duration_api_ms=1,
+        is_error=False,
+        num_turns=1,
+        session_id=session_id,
+    )
+
+
+class FakeSDKClient:
+    """Stand-in for ClaudeSDKClient that replays scripted messages."""
+
+    def __init__(self, options: ClaudeCodeOptions | None = None):
+        self.options = options
+        self.messages: list[Message] = []
+        self.connected = False
+        self.disconnected = False
+
+    async def connect(self, prompt: Any = None) -> None:
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        self.disconnected = True
+
+    async def receive_messages(self) -> AsyncIterator[Message]:
+        for message in self.messages:
+            yield message
+
+    async def receive_response(self) -> AsyncIterator[Message]:
+        for message in self.messages:
+            yield message
+            if isinstance(message, ResultMessage):
+                return
+
+
+class TestSessionPersistentClient:
+    """Test SessionPersistentClient against a fake SDK client."""
+
+    @pytest.fixture(autouse=True)
+    def fake_sdk_client(self, monkeypatch):
+        """Replace ClaudeSDKClient with FakeSDKClient."""
+        monkeypatch.setattr(session_client, "ClaudeSDKClient", FakeSDKClient)
+
+    @pytest.fixture
+    def temp_storage(self):
+        """Create temporary storage directory."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    @pytest.mark.trio
+    async def test_messages_are_batched(self, temp_storage, monkeypatch):
+        """Test that messages received together are written by a single flush."""
+        client = SessionPersistentClient(storage_path=temp_storage)
+        client.client.messages = [
+            result_message("s1"),
+            UserMessage(content="one"),
+            UserMessage(content="two"),
+            UserMessage(content="three"),
+        ]
+
+        saves: list[int] = []
+        save_session = client._persistence.save_session
+
+        async def counting_save(session_data):
+            saves.append(len(session_data.conversation_history))
+            await save_session(session_data)
+
+        monkeypatch.setattr(client._persistence, "save_session", counting_save)
+
+        async with client:
+            async for _ in client.receive_messages():
+                pass
+            with trio.fail_after(5):
+                while len(saves) < 2:
+                    await trio.sleep(0.01)
+
+            # The header is saved when the session starts; one flush writes the rest
+            assert saves == [0, 4]
+
+        assert client.client.disconnected is True
+        log_lines = (temp_storage / "s1.jsonl").read_bytes().splitlines()
+        assert len(log_lines) == 4
+
+    @pytest.mark.trio
+    async def test_persist_types_filter(self, temp_storage):
+        """Test that message types outside persist_types are not saved."""
+        client = SessionPersistentClient(storage_path=temp_storage)
+        client.client.messages = [
+            result_message("s1"),
+            SystemMessage(subtype="init", data={}),
+            UserMessage(content="Hello"),
+        ]
+
+        await client.connect()
+        async for _ in client.receive_messages():
+            pass
+        await client.disconnect()
+
+        loaded = await SimpleSessionPersistence(temp_storage).load_session("s1")
+        assert loaded is not None
+        assert [type(msg) for msg in loaded.conversation_history] == [ResultMessage, UserMessage]
+
+    @pytest.mark.trio
+    async def test_session_id_change_renames_session(self, temp_storage):
+        """Test that a server-side session ID change moves the stored session."""
+        client = SessionPersistentClient(storage_path=temp_storage)
+        client.client.messages = [
+            result_message("old"),
+            UserMessage(content="Hello"),
+            result_message("new"),
+        ]
+
+        async with client:
+            async for _ in client.receive_messages():
+                pass
+
+        persistence = SimpleSessionPersistence(temp_storage)
+        assert await persistence.list_sessions() == ["new"]
+        loaded = await persistence.load_session("new")
+        assert loaded is not None
+        assert loaded.session_id == "new"
+        assert len(loaded.conversation_history) == 3
+
+    @pytest.mark.trio
+    async def test_session_id_change_during_flush(self, temp_storage, monkeypatch):
+        """Test that a rename arriving while a flush is writing leaves no orphan session."""
+        client = SessionPersistentClient(storage_path=temp_storage)
+        encode_document = client._persistence._encode_document
+
+        def slow_encode_document(data):
+            time.sleep(0.1)
+            return encode_document(data)
+
+        async with client:
+            await client._handle_message_persistence(result_message("old"))
+            monkeypatch.setattr(client._persistence, "_encode_document", slow_encode_document)
+            await client._handle_message_persistence(UserMessage(content="Hello"))
+            # Let the flusher start its slow save, then change the session ID under it
+            await trio.sleep(0.07)
+            await client._handle_message_persistence(result_message("new"))
+
+        persistence = SimpleSessionPersistence(temp_storage)
+        assert await persistence.list_sessions() == ["new"]
+        loaded = await persistence.load_session("new")
+        assert loaded is not None
+        assert len(loaded.conversation_history) == 3
+
+    @pytest.mark.trio
+    async def test_resume_loads_stored_session(self, temp_storage):
+        """Test that resuming a session continues its stored history."""
+        first = SessionPersistentClient(storage_path=temp_storage)
+        first.client.messages = [result_message("s1"), UserMessage(content="Hello")]
+        async with first:
+            async for _ in first.receive_messages():
+                pass
+
+        second = SessionPersistentClient(storage_path=temp_storage)
+        await second.start_or_resume_session("s1")
+        assert second.client.options is not None
+        assert second.client.options.resume == "s1"
+        assert second.session_data is not None
+        assert len(second.session_data.conversation_history) == 2
+
+        second.client.messages = [AssistantMessage(content=[TextBlock(text="Hi")])]
+        second.client.messages.append(result_message("s1"))
+        async with second:
+            async for _ in second.receive_messages():
+                pass
+
+        loaded = await SimpleSessionPersistence(temp_storage).load_session("s1")
+        assert loaded is not None
+        assert len(loaded.conversation_history) == 4
+
+    @pytest.mark.trio
+    async def test_only_resumed_sessions_are_loaded(self, temp_storage, monkeypatch):
+        """Test that a new session ID is only looked up on disk when it is being resumed."""
+        first = SessionPersistentClient(storage_path=temp_storage)
+        first.client.messages = [result_message("s1"), UserMessage(content="Hello")]
+        async with first:
+            async for _ in first.receive_messages():
+                pass
+
+        # Resuming through the options loads the stored history on the first message
+        resumed = SessionPersistentClient(
+            options=ClaudeCodeOptions(resume="s1"), storage_path=temp_storage
+        )
+        resumed.client.messages = [result_message("s1")]
+        async with resumed:
+            async for _ in resumed.receive_messages():
+                pass
+        assert resumed.session_data is not None
+        assert len(resumed.session_data.conversation_history) == 3
+
+        # A fresh session never reads from disk
+        fresh = SessionPersistentClient(storage_path=temp_storage)
+        fresh.client.messages = [result_message("s2")]
+
+        async def unexpected_load(*args):
+            raise AssertionError("load_session called for a new session")
+
+        monkeypatch.setattr(fresh._persistence, "load_session", unexpected_load)
+        async with fresh:
+            async for _ in fresh.receive_messages():
+                pass
+        assert fresh.session_data is not None
+        assert len(fresh.session_data.conversation_history) == 1
+
+    @pytest.mark.trio
+    async def test_failed_flush_does_not_cancel_caller(self, temp_storage, monkeypatch, caplog):
+        """Test that a failing background save is logged and disconnect still runs."""
+        client = SessionPersistentClient(storage_path=temp_storage)
+        client.client.messages = [result_message("s1"), UserMessage(content="Hello")]
+
+        async def failing_save(session_data):
+            raise OSError("disk full")
+
+        with pytest.raises(OSError):
+            async with client:
+                async for message in client.receive_messages():
+                    if isinstance(message, ResultMessage):
+                        # The session header is written; make every later save fail
+                        monkeypatch.setattr(client._persistence, "save_session", failing_save)
+                # Give the flusher time to fail; the caller keeps running
+                await trio.sleep(0.2)
+
+        assert "Failed to save session s1" in caplog.text
+        # The final save raised, but the SDK client was still disconnected
+        assert client.client.disconnected is True
@@ -1,12 +1,26 @@
 """Tests for session storage functionality."""
 
+import os
 import tempfile
+import time
 from datetime import datetime
 from pathlib import Path
 
+import orjson
 import pytest
-from claude_code_sdk.types import UserMessage
+import trio
+from claude_code_sdk.types import (
+    AssistantMessage,
+    ClaudeCodeOptions,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
 
+from claude_code_session_client._internal import session_storage
 from claude_code_session_client._internal.session_storage import (
     SessionData,
     SimpleSessionPersistence,
@@ -29,6 +43,16 @@ class TestSessionData:
         assert session_data.working_directory == "/tmp"
         assert len(session_data.conversation_history) == 0
 
+    def test_session_data_has_no_instance_dict(self):
+        """Test that SessionData stores its fields in slots rather than a __dict__."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+
+        assert not hasattr(session_data, "__dict__")
+
     def test_add_message(self):
         """Test adding messages to session data."""
         session_data = SessionData(
@@ -43,6 +67,19 @@ class TestSessionData:
         assert len(session_data.conversation_history) == 1
         assert session_data.conversation_history[0] == message
 
+    def test_add_message_with_timestamp(self):
+        """Test that add_message records the provided timestamp as last activity."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime(2023, 1, 1, 12, 0, 0),
+            last_activity=datetime(2023, 1, 1, 12, 0, 0),
+        )
+
+        now = datetime(2023, 1, 1, 12, 5, 0)
+        session_data.add_message(UserMessage(content="Hello"), now)
+
+        assert session_data.last_activity == now
+
     def test_serialization(self):
         """Test serialization and deserialization."""
         original = SessionData(
@@ -69,6 +106,115 @@ class TestSessionData:
         assert restored.working_directory == original.working_directory
         assert len(restored.conversation_history) == 1
 
+    def test_serialization_of_timestamps(self):
+        """Test that timestamps round-trip exactly, including legacy ISO strings."""
+        original = SessionData(
+            session_id="test-session",
+            start_time=datetime(2023, 1, 1, 12, 0, 0, 123456),
+            last_activity=datetime(2023, 1, 1, 12, 5, 0, 654321),
+        )
+
+        data_dict = original.to_dict()
+        restored = SessionData.from_dict(data_dict)
+
+        assert isinstance(data_dict["start_time"], float)
+        assert restored.start_time == original.start_time
+        assert restored.last_activity == original.last_activity
+
+        data_dict["start_time"] = original.start_time.isoformat()
+        data_dict["last_activity"] = original.last_activity.isoformat()
+        legacy = SessionData.from_dict(data_dict)
+
+        assert legacy.start_time == original.start_time
+        assert legacy.last_activity == original.last_activity
+
+    def test_serialization_of_options_is_cached(self):
+        """Test that options are serialized once and re-serialized when replaced."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+            options=ClaudeCodeOptions(model="model-a", allowed_tools=["Read"]),
+        )
+
+        first = session_data.to_dict()["options"]
+        assert first == {"model": "model-a", "allowed_tools": ["Read"], "permission_mode": None}
+        assert session_data.to_dict()["options"] is first
+
+        session_data.options = ClaudeCodeOptions(model="model-b")
+        second = session_data.to_dict()["options"]
+        assert second is not first
+        assert second["model"] == "model-b"
+
+        session_data.options = None
+        assert session_data.to_dict()["options"] is None
+
+    def test_serialization_of_all_message_types(self):
+        """Test that every supported message and content block round-trips."""
+        messages = [
+            UserMessage(content="Hello"),
+            AssistantMessage(
+                content=[
+                    TextBlock(text="Let me check."),
+                    ToolUseBlock(id="tool-1", name="Read", input={"path": "a.txt"}),
+                    ToolResultBlock(tool_use_id="tool-1", content="data", is_error=False),
+                ]
+            ),
+            UserMessage(
+                content=[
+                    ToolResultBlock(tool_use_id="tool-1", content="out", is_error=False),
+                    TextBlock(text="hi"),
+                ]
+            ),
+            SystemMessage(subtype="init", data={"cwd": "/tmp"}),
+            ResultMessage(
+                subtype="success",
+                duration_ms=10,
+                duration_api_ms=8,
+                is_error=False,
+                num_turns=1,
+                session_id="test-session",
+                total_cost_usd=0.01,
+                usage={"input_tokens": 5},
+                result="done",
+            ),
+        ]
+        original = SessionData(
+            session_id="test-session",
+            start_time=datetime(2023, 1, 1, 12, 0, 0),
+            last_activity=datetime(2023, 1, 1, 12, 5, 0),
+            conversation_history=list(messages),
+        )
+
+        restored = SessionData.from_dict(original.to_dict())
+
+        assert restored.conversation_history == messages
+
+    def test_serialized_blocks_contain_only_their_fields(self):
+        """Test that content blocks serialize without padding from other block types."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(
+            AssistantMessage(
+                content=[
+                    TextBlock(text="Hi"),
+                    ToolResultBlock(tool_use_id="tool-1"),
+                ]
+            )
+        )
+
+        blocks = session_data.to_dict()["conversation_history"][0]["content"]
+
+        assert blocks == [
+            {"type": "TextBlock", "text": "Hi"},
+            {"type": "ToolResultBlock", "tool_use_id": "tool-1"},
+        ]
+        restored = SessionData.from_dict(session_data.to_dict())
+        assert restored.conversation_history == session_data.conversation_history
+
 
 class TestSimpleSessionPersistence:
     """Test SimpleSessionPersistence functionality."""
@@ -120,6 +266,25 @@ class TestSimpleSessionPersistence:
         loaded = await persistence.load_session("nonexistent")
         assert loaded is None
 
+    @pytest.mark.trio
+    async def test_load_log_of_session_deleted_while_loading(self, persistence, temp_storage):
+        """Test that files removed after the session was located do not raise."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        (temp_storage / "test-session.jsonl").unlink()
+        loaded = persistence._load_log("test-session")
+        assert loaded is not None
+        assert loaded.conversation_history == []
+
+        (temp_storage / "test-session.meta.json").unlink()
+        assert persistence._load_log("test-session") is None
+
     @pytest.mark.trio
     async def test_list_sessions(self, persistence):
         """Test listing sessions."""
@@ -165,3 +330,538 @@ class TestSimpleSessionPersistence:
         # Try deleting again
         deleted = await persistence.delete_session("test-session")
         assert deleted is False
+
+    @pytest.mark.trio
+    async def test_append_message(self, persistence, temp_storage):
+        """Test appending messages to a saved session's log."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        await persistence.append_message("test-session", UserMessage(content="Again"))
+
+        log_lines = (temp_storage / "test-session.jsonl").read_text().splitlines()
+        assert len(log_lines) == 2
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert [msg.content for msg in loaded.conversation_history] == ["Hello", "Again"]
+
+    @pytest.mark.trio
+    async def test_compact_session(self, persistence, temp_storage):
+        """Test folding a session log into a single JSON document."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        assert await persistence.compact("test-session") is True
+        assert not (temp_storage / "test-session.jsonl").exists()
+        assert (temp_storage / "test-session.json").exists()
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert len(loaded.conversation_history) == 1
+        assert await persistence.list_sessions() == ["test-session"]
+
+        assert await persistence.compact("nonexistent") is False
+
+    @pytest.mark.trio
+    async def test_pretty_output(self, temp_storage):
+        """Test that pretty persistence writes indented, loadable metadata."""
+        persistence = SimpleSessionPersistence(temp_storage, pretty=True)
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+            working_directory="/tmp",
+        )
+        await persistence.save_session(session_data)
+
+        assert "\n  " in (temp_storage / "test-session.meta.json").read_text()
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert loaded.working_directory == "/tmp"
+
+    @pytest.mark.trio
+    async def test_save_session_appends_only_new_messages(self, persistence, temp_storage):
+        """Test that repeated saves append new messages instead of rewriting the log."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        log_path = temp_storage / "test-session.jsonl"
+        first_line = log_path.read_bytes()
+
+        session_data.add_message(UserMessage(content="Again"))
+        await persistence.save_session(session_data)
+        await persistence.save_session(session_data)
+
+        assert log_path.read_bytes().startswith(first_line)
+        assert len(log_path.read_bytes().splitlines()) == 2
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert [msg.content for msg in loaded.conversation_history] == ["Hello", "Again"]
+
+    @pytest.mark.trio
+    async def test_unchanged_save_is_skipped(self, persistence, temp_storage):
+        """Test that saving an unchanged session does not rewrite its files."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        meta_path = temp_storage / "test-session.meta.json"
+        mtime_ns = meta_path.stat().st_mtime_ns
+        inode = meta_path.stat().st_ino
+        await persistence.save_session(session_data)
+        assert meta_path.stat().st_ino == inode
+        assert meta_path.stat().st_mtime_ns == mtime_ns
+
+        # Files removed behind the persistence's back are written again
+        meta_path.unlink()
+        await persistence.save_session(session_data)
+        assert meta_path.exists()
+
+    @pytest.mark.trio
+    async def test_durable_save_leaves_no_temp_files(self, temp_storage):
+        """Test that atomic saves and sync leave only the session files behind."""
+        persistence = SimpleSessionPersistence(temp_storage, durable=True)
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+        await persistence.sync("test-session")
+
+        assert sorted(p.name for p in temp_storage.iterdir()) == [
+            "test-session.jsonl",
+            "test-session.meta.json",
+        ]
+
+    @pytest.mark.trio
+    async def test_save_recreates_removed_directory(self, temp_storage):
+        """Test that saving recreates a storage directory removed after first use."""
+        storage_path = temp_storage / "sessions"
+        SimpleSessionPersistence(storage_path)
+        storage_path.rmdir()
+
+        # A second instance for an equivalent path skips the mkdir, the save recreates it
+        persistence = SimpleSessionPersistence(temp_storage / "." / "sessions")
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+        await persistence.append_message("test-session", UserMessage(content="Again"))
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert len(loaded.conversation_history) == 2
+
+    def test_leftover_temp_files_are_removed(self, temp_storage):
+        """Test that only stale temporary files from interrupted writes are swept on init."""
+        stale = temp_storage / ".test-session.meta.json.abc123.tmp"
+        stale.write_bytes(b"{")
+        two_hours_ago = time.time() - 2 * 60 * 60
+        os.utime(stale, (two_hours_ago, two_hours_ago))
+        # A recent temporary file may belong to another process that is still writing
+        (temp_storage / ".other-session.meta.json.def456.tmp").write_bytes(b"{")
+        (temp_storage / "test-session.meta.json").write_bytes(b"{}")
+
+        SimpleSessionPersistence(temp_storage)
+
+        assert sorted(p.name for p in temp_storage.iterdir()) == [
+            ".other-session.meta.json.def456.tmp",
+            "test-session.meta.json",
+        ]
+
+    @pytest.mark.trio
+    async def test_saving_legacy_snapshot_replaces_it(self, persistence, temp_storage):
+        """Test that saving a session loaded from a single-document file converts it."""
+        legacy = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        legacy.add_message(UserMessage(content="Hello"))
+        (temp_storage / "test-session.json").write_bytes(orjson.dumps(legacy.to_dict()))
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert loaded._last_saved_index == 1
+        loaded.add_message(UserMessage(content="Again"))
+        await persistence.save_session(loaded)
+
+        assert sorted(p.name for p in temp_storage.iterdir()) == [
+            "test-session.jsonl",
+            "test-session.meta.json",
+        ]
+        reloaded = await persistence.load_session("test-session")
+        assert reloaded is not None
+        assert len(reloaded.conversation_history) == 2
+
+    @pytest.mark.trio
+    async def test_load_session_filters_message_types(self, persistence):
+        """Test that load_session can keep only selected message types."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(SystemMessage(subtype="init", data={}))
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        loaded = await persistence.load_session("test-session", (UserMessage,))
+
+        assert loaded is not None
+        assert loaded.conversation_history == [UserMessage(content="Hello")]
+
+        # Saving the filtered session keeps the messages it left out
+        await persistence.save_session(loaded)
+        reloaded = await persistence.load_session("test-session")
+        assert reloaded is not None
+        assert len(reloaded.conversation_history) == 2
+
+    @pytest.mark.trio
+    async def test_filtered_snapshot_session_keeps_history_on_save(self, persistence):
+        """Test that saving a filtered load of a snapshot keeps the filtered-out messages."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(SystemMessage(subtype="init", data={}))
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+        await persistence.compact("test-session")
+
+        loaded = await persistence.load_session("test-session", (UserMessage,))
+        assert loaded is not None
+        loaded.add_message(UserMessage(content="Again"))
+        await persistence.save_session(loaded)
+
+        reloaded = await persistence.load_session("test-session")
+        assert reloaded is not None
+        assert reloaded.conversation_history == [
+            SystemMessage(subtype="init", data={}),
+            UserMessage(content="Hello"),
+            UserMessage(content="Again"),
+        ]
+        assert await persistence.list_sessions() == ["test-session"]
+
+    @pytest.mark.trio
+    @pytest.mark.parametrize("compacted", [False, True])
+    async def test_empty_filtered_load_keeps_history_on_save(self, persistence, compacted):
+        """Test that saving a load whose filter kept no messages loses nothing."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(SystemMessage(subtype="init", data={}))
+        await persistence.save_session(session_data)
+        if compacted:
+            await persistence.compact("test-session")
+
+        loaded = await persistence.load_session("test-session", (UserMessage,))
+        assert loaded is not None
+        assert loaded.conversation_history == []
+        loaded.last_activity = datetime.now()
+        await persistence.save_session(loaded)
+
+        reloaded = await persistence.load_session("test-session")
+        assert reloaded is not None
+        assert reloaded.conversation_history == [SystemMessage(subtype="init", data={})]
+
+    @pytest.mark.trio
+    async def test_load_session_metadata(self, persistence):
+        """Test loading a session header without its conversation history."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+            working_directory="/test/dir",
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        header = await persistence.load_session_metadata("test-session")
+        assert header is not None
+        assert header.working_directory == "/test/dir"
+        assert header.conversation_history == []
+
+        # Saving the header appends new messages instead of rewriting the stored log
+        header.add_message(UserMessage(content="Again"))
+        await persistence.save_session(header)
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert len(loaded.conversation_history) == 2
+
+        assert await persistence.load_session_metadata("missing") is None
+
+    @pytest.mark.trio
+    async def test_load_session_metadata_of_snapshot(self, persistence):
+        """Test that saving a header loaded from a snapshot keeps the snapshot's history."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+        await persistence.compact("test-session")
+
+        header = await persistence.load_session_metadata("test-session")
+        assert header is not None
+        assert header.conversation_history == []
+
+        header.add_message(UserMessage(content="new"))
+        await persistence.save_session(header)
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert loaded.conversation_history == [
+            UserMessage(content="Hello"),
+            UserMessage(content="new"),
+        ]
+
+    @pytest.mark.trio
+    async def test_list_sessions_with_headers(self, persistence):
+        """Test listing session metadata for every stored session."""
+        for i in range(3):
+            session_data = SessionData(
+                session_id=f"session-{i}",
+                start_time=datetime.now(),
+                last_activity=datetime.now(),
+                working_directory=f"/dir/{i}",
+            )
+            session_data.add_message(UserMessage(content="Hello"))
+            await persistence.save_session(session_data)
+        await persistence.compact("session-1")
+
+        headers = await persistence.list_sessions_with_headers()
+
+        assert [h.session_id for h in headers] == ["session-0", "session-1", "session-2"]
+        assert [h.working_directory for h in headers] == ["/dir/0", "/dir/1", "/dir/2"]
+        assert all(h.conversation_history == [] for h in headers)
+
+    @pytest.mark.trio
+    async def test_rename_session(self, persistence):
+        """Test moving a session to a new session ID."""
+        session_data = SessionData(
+            session_id="old-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        assert await persistence.rename_session("old-session", "new-session") is True
+        assert await persistence.list_sessions() == ["new-session"]
+
+        session_data.session_id = "new-session"
+        session_data.add_message(UserMessage(content="Again"))
+        await persistence.save_session(session_data)
+
+        loaded = await persistence.load_session("new-session")
+        assert loaded is not None
+        assert loaded.session_id == "new-session"
+        assert len(loaded.conversation_history) == 2
+
+        assert await persistence.rename_session("old-session", "other-session") is False
+
+    @pytest.mark.trio
+    async def test_load_session_cache(self, persistence):
+        """Test that unchanged sessions are served from cache and changes invalidate it."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        first = await persistence.load_session("test-session")
+        assert await persistence.load_session("test-session") is first
+
+        await persistence.append_message("test-session", UserMessage(content="Again"))
+        reloaded = await persistence.load_session("test-session")
+        assert reloaded is not first
+        assert len(reloaded.conversation_history) == 2
+
+        await persistence.delete_session("test-session")
+        assert await persistence.load_session("test-session") is None
+
+    @pytest.mark.trio
+    async def test_save_session_populates_cache(self, persistence, monkeypatch):
+        """Test that a saved session is returned by load_session without re-reading it."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        session_data.add_message(object())  # not a serializable message type
+        await persistence.save_session(session_data)
+
+        # Changes made after the save are not visible through the cache
+        session_data.add_message(UserMessage(content="Not saved yet"))
+
+        def unexpected_read(session_id):
+            raise AssertionError("session was read from disk")
+
+        monkeypatch.setattr(persistence, "_load_log", unexpected_read)
+        loaded = await persistence.load_session("test-session")
+
+        assert loaded is not None
+        assert loaded is not session_data
+        assert loaded.conversation_history == [UserMessage(content="Hello")]
+        assert await persistence.load_session("test-session") is loaded
+
+    @pytest.mark.trio
+    async def test_save_session_extends_cache(self, persistence, monkeypatch):
+        """Test that appending saves extend the cached copy and leave handed-out ones alone."""
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+        session_data.add_message(UserMessage(content="Again"))
+        await persistence.save_session(session_data)
+
+        def unexpected_read(session_id):
+            raise AssertionError("session was read from disk")
+
+        monkeypatch.setattr(persistence, "_load_log", unexpected_read)
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert len(loaded.conversation_history) == 2
+
+        # A copy returned by load_session is not changed by later saves
+        session_data.add_message(UserMessage(content="Third"))
+        await persistence.save_session(session_data)
+        assert len(loaded.conversation_history) == 2
+        monkeypatch.undo()
+        reloaded = await persistence.load_session("test-session")
+        assert reloaded is not None
+        assert reloaded is not loaded
+        assert len(reloaded.conversation_history) == 3
+
+    @pytest.mark.trio
+    async def test_saved_headers_are_bounded(self, persistence, monkeypatch):
+        """Test that the record of saved headers is kept to the cache size."""
+        monkeypatch.setattr(session_storage, "_CACHE_SIZE", 2)
+        for index in range(3):
+            await persistence.save_session(
+                SessionData(
+                    session_id=f"session-{index}",
+                    start_time=datetime.now(),
+                    last_activity=datetime.now(),
+                )
+            )
+
+        assert list(persistence._written) == ["session-1", "session-2"]
+
+    @pytest.mark.trio
+    async def test_compact_session_compressed(self, temp_storage):
+        """Test compacting a session into a zstd-compressed snapshot."""
+        pytest.importorskip("zstandard")
+        persistence = SimpleSessionPersistence(temp_storage, compress=True)
+        session_data = SessionData(
+            session_id="test-session",
+            start_time=datetime.now(),
+            last_activity=datetime.now(),
+        )
+        session_data.add_message(UserMessage(content="Hello"))
+        await persistence.save_session(session_data)
+
+        assert await persistence.compact("test-session") is True
+        assert [p.name for p in temp_storage.iterdir()] == ["test-session.json.zst"]
+
+        loaded = await persistence.load_session("test-session")
+        assert loaded is not None
+        assert len(loaded.conversation_history) == 1
+        assert await persistence.list_sessions() == ["test-session"]
+
+        assert await persistence.delete_session("test-session") is True
+        assert await persistence.list_sessions() == []
+
+    @pytest.mark.trio
+    async def test_save_sessions(self, temp_storage):
+        """Test saving a batch of sessions in one call."""
+        persistence = SimpleSessionPersistence(temp_storage, durable=True)
+        sessions = [
+            SessionData(
+                session_id=f"session-{i}",
+                start_time=datetime.now(),
+                last_activity=datetime.now(),
+            )
+            for i in range(3)
+        ]
+
+        await persistence.save_sessions(sessions)
+
+        assert await persistence.list_sessions() == ["session-0", "session-1", "session-2"]
+
+    @pytest.mark.trio
+    async def test_delete_sessions(self, persistence):
+        """Test deleting a batch of sessions in one call."""
+        for i in range(3):
+            await persistence.save_session(
+                SessionData(
+                    session_id=f"session-{i}",
+                    start_time=datetime.now(),
+                    last_activity=datetime.now(),
+                )
+            )
+
+        deleted = await persistence.delete_sessions(["session-0", "session-2", "missing"])
+
+        assert deleted == 2
+        assert await persistence.list_sessions() == ["session-1"]
+
+    @pytest.mark.trio
+    async def test_concurrent_saves(self, persistence):
+        """Test saving several sessions concurrently from one event loop."""
+        session_ids = [f"session-{i}" for i in range(5)]
+
+        async with trio.open_nursery() as nursery:
+            for session_id in session_ids:
+                session_data = SessionData(
+                    session_id=session_id,
+                    start_time=datetime.now(),
+                    last_activity=datetime.now(),
+                )
+                session_data.add_message(UserMessage(content=session_id))
+                nursery.start_soon(persistence.save_session, session_data)
+
+        assert await persistence.list_sessions() == session_ids
+        for session_id in session_ids:
+            loaded = await persistence.load_session(session_id)
+            assert loaded is not None
+            assert loaded.conversation_history == [UserMessage(content=session_id)]